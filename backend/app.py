@@ -1,8 +1,19 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 from models.spam_detector import SpamDetector
 from models.email_summarizer import EmailSummarizer
+from models.campaign_index import CampaignIndex
+from utils.metrics import MetricsRegistry
+from utils.serving import read_memory_kb
+from utils.admission import AdmissionController, Overloaded, admission_limits
+from utils.profiler import TimedProfiler, RequestProfiler
+from utils.bulk import iter_raw_lines, parse_email_line, iter_chunks, LineTooLong
+from concurrent.futures import ThreadPoolExecutor
 import os
+import json
+import time
+import threading
+import hmac
 import logging
 
 # Configure logging
@@ -15,10 +26,60 @@ CORS(app)
 # Initialize models
 spam_detector = None
 email_summarizer = None
+campaign_index = None
+
+# Request metrics
+metrics = MetricsRegistry()
+
+# Admission control, per worker process
+DEFAULT_DEADLINE_MS = int(os.environ.get('DEFAULT_DEADLINE_MS', 30000))
+limits = admission_limits()
+admission = {
+    'predict': AdmissionController(
+        'predict',
+        max_concurrency=limits['predict_concurrency'],
+        max_queue=limits['predict_queue'],
+        initial_service_time=0.01,
+        metrics=metrics
+    ),
+    'summarize': AdmissionController(
+        'summarize',
+        max_concurrency=limits['summarize_concurrency'],
+        max_queue=limits['summarize_queue'],
+        initial_service_time=2.0,
+        metrics=metrics
+    )
+}
+
+# /analyze degrades its summary once the summarize queue is this full
+ANALYZE_DEGRADE_PRESSURE = float(os.environ.get('ANALYZE_DEGRADE_PRESSURE', 0.75))
+
+# Concurrent /analyze: summaries started before the spam verdict is known
+ANALYZE_MODES = ('sequential', 'parallel', 'speculative')
+SPECULATIVE_CANCEL_CONFIDENCE = float(os.environ.get('SPECULATIVE_CANCEL_CONFIDENCE', 0.9))
+# One thread per summarize slot and queue entry, so an early summary never
+# waits in the executor's own queue where admission control can't see it
+ANALYZE_THREADS = limits['summarize_concurrency'] + limits['summarize_queue']
+analyze_executor = ThreadPoolExecutor(max_workers=ANALYZE_THREADS, thread_name_prefix='analyze')
+analyze_slots = threading.BoundedSemaphore(ANALYZE_THREADS)
+
+# On-demand profiling; admin endpoints are disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+MAX_PROFILE_SECONDS = 60
+MIN_PROFILE_INTERVAL_MS = 1
+MAX_PROFILE_INTERVAL_MS = 1000
+worker_profiler = TimedProfiler()
+request_profiler = RequestProfiler()
+
+# NDJSON bulk scoring
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 256))
+BULK_MAX_LINE_BYTES = int(os.environ.get('BULK_MAX_LINE_BYTES', 1048576))
+BULK_PREDICT_DEADLINE_MS = int(os.environ.get('BULK_PREDICT_DEADLINE_MS', 60000))
+BULK_SUMMARY_DEADLINE_MS = int(os.environ.get('BULK_SUMMARY_DEADLINE_MS', 120000))
 
 def initialize_models():
     """Initialize ML models on startup"""
-    global spam_detector, email_summarizer
+    global spam_detector, email_summarizer, campaign_index
     
     try:
         logger.info("Initializing spam detector...")
@@ -27,11 +88,91 @@ def initialize_models():
         logger.info("Initializing email summarizer...")
         email_summarizer = EmailSummarizer()
         
+        logger.info("Initializing campaign index...")
+        campaign_index = CampaignIndex(
+            threshold=float(os.environ.get('CAMPAIGN_SIMILARITY_THRESHOLD', 0.8)),
+            max_clusters=int(os.environ.get('CAMPAIGN_MAX_CLUSTERS', 10000)),
+            ttl_seconds=int(os.environ.get('CAMPAIGN_TTL_SECONDS', 3600))
+        )
+        
         logger.info("Models initialized successfully!")
     except Exception as e:
         logger.error(f"Error initializing models: {str(e)}")
         raise e
 
+def get_explain_top_n(data):
+    """Read the optional 'explain' flag (true or a feature count) from a request"""
+    explain = data.get('explain', False)
+    
+    if explain is True:
+        return 10
+    if isinstance(explain, int) and not isinstance(explain, bool) and explain > 0:
+        return min(explain, 50)
+    return 0
+
+def get_deadline(data):
+    """Absolute time.monotonic() deadline from 'deadline_ms' or the X-Deadline-Ms header"""
+    deadline_ms = data.get('deadline_ms') or request.headers.get('X-Deadline-Ms') or DEFAULT_DEADLINE_MS
+    
+    try:
+        deadline_ms = float(deadline_ms)
+    except (TypeError, ValueError):
+        deadline_ms = DEFAULT_DEADLINE_MS
+    
+    return time.monotonic() + deadline_ms / 1000
+
+def overloaded_response(e):
+    """Error response for a request refused by admission control"""
+    response = jsonify({
+        'error': 'Server is overloaded, please retry later',
+        'reason': e.reason,
+        'endpoint': e.endpoint
+    })
+    response.status_code = e.status_code
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def score_email(clean_text):
+    """Score a preprocessed email, reusing the verdict of a near-duplicate campaign if one is indexed
+    
+    Takes the output of spam_detector.preprocess_text() so the text is only
+    preprocessed once per request. Returns (prediction, confidence, cluster, reused).
+    """
+    cluster, similarity, signature = campaign_index.lookup(clean_text)
+    
+    if cluster is not None:
+        return cluster.prediction, cluster.confidence, cluster, True
+    
+    prediction, confidence = spam_detector.predict_batch([clean_text], preprocessed=True)[0]
+    cluster = campaign_index.add(signature, prediction, confidence)
+    
+    return prediction, confidence, cluster, False
+
+def campaign_info(cluster, reused):
+    """Campaign details included in prediction responses"""
+    if cluster is None:
+        return None
+    return {
+        'cluster_id': cluster.cluster_id,
+        'cluster_size': cluster.size,
+        'reused_verdict': reused
+    }
+
+def is_admin():
+    """True if the request carries the configured admin token"""
+    token = request.headers.get('X-Admin-Token', '')
+    # Compare bytes: compare_digest rejects non-ASCII str arguments
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+@app.before_request
+def start_request_profile():
+    g.profiled = request_profiler.begin(request.path)
+
+@app.teardown_request
+def end_request_profile(exc):
+    if g.get('profiled'):
+        request_profiler.end()
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -55,15 +196,25 @@ def predict_spam():
             return jsonify({'error': 'Email text cannot be empty'}), 400
         
         # Get prediction
-        prediction = spam_detector.predict(email_text)
-        confidence = spam_detector.get_confidence(email_text)
+        with admission['predict'].admit(get_deadline(data)):
+            clean_text = spam_detector.preprocess_text(email_text)
+            prediction, confidence, cluster, reused = score_email(clean_text)
         
-        return jsonify({
+        result = {
             'prediction': prediction,
             'confidence': float(confidence),
-            'is_spam': prediction == 'spam'
-        })
+            'is_spam': prediction == 'spam',
+            'campaign': campaign_info(cluster, reused)
+        }
         
+        top_n = get_explain_top_n(data)
+        if top_n:
+            result['explanation'] = spam_detector.explain_batch([clean_text], top_n, preprocessed=True)[0]
+        
+        return jsonify(result)
+        
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"Error in spam prediction: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -85,7 +236,8 @@ def summarize_email():
             return jsonify({'error': 'Email text cannot be empty'}), 400
         
         # Get summary
-        summary = email_summarizer.summarize(email_text, max_length, min_length)
+        with admission['summarize'].admit(get_deadline(data)):
+            summary = email_summarizer.summarize(email_text, max_length, min_length)
         
         return jsonify({
             'summary': summary,
@@ -93,10 +245,104 @@ def summarize_email():
             'summary_length': len(summary.split())
         })
         
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"Error in email summarization: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def sse_event(event, payload):
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/summarize/stream', methods=['POST'])
+def summarize_email_stream():
+    """Summarize email content, streaming text as it is generated (server-sent events)"""
+    data = request.get_json()
+    
+    if not data or 'text' not in data:
+        return jsonify({'error': 'Email text is required'}), 400
+    
+    email_text = data['text']
+    max_length = data.get('max_length', 50)
+    min_length = data.get('min_length', 10)
+    
+    if not email_text.strip():
+        return jsonify({'error': 'Email text cannot be empty'}), 400
+    
+    # Hold a summarization slot until the response is closed, which also
+    # happens when the client disconnects mid-stream
+    try:
+        started = admission['summarize'].acquire(get_deadline(data))
+    except Overloaded as e:
+        return overloaded_response(e)
+    
+    cancel_event = threading.Event()
+    stream = email_summarizer.summarize_stream(
+        email_text, max_length, min_length, cancel_event,
+        wrap_thread=request_profiler.follow
+    )
+    
+    def generate():
+        try:
+            for event, payload in stream:
+                if event == 'token':
+                    yield sse_event('token', {'text': payload})
+                    continue
+                
+                metrics.latency('summarize_stream.time_to_first_token').observe(payload['time_to_first_token'])
+                metrics.latency('summarize_stream.total').observe(payload['total_time'])
+                
+                summary = payload['summary']
+                yield sse_event('done', {
+                    'summary': summary,
+                    'original_length': len(email_text.split()),
+                    'summary_length': len(summary.split()),
+                    'stats': payload['stats'],
+                    'time_to_first_token_ms': payload['time_to_first_token'] * 1000,
+                    'total_time_ms': payload['total_time'] * 1000
+                })
+        
+        except Exception as e:
+            logger.error(f"Error in streaming summarization: {str(e)}")
+            yield sse_event('error', {'error': 'Internal server error'})
+        finally:
+            stream.close()
+    
+    def on_close():
+        # Stop generation for a caller that has gone away, and only give the
+        # slot back once the model is no longer running
+        cancel_event.set()
+        stream.close()
+        admission['summarize'].release(started)
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(on_close)
+    return response
+
+def run_summary(email_text, max_length, min_length, deadline, cancel_event=None):
+    """Summarize under admission control; returns (summary, seconds spent generating)"""
+    with admission['summarize'].admit(deadline):
+        start = time.perf_counter()
+        summary = email_summarizer.summarize(email_text, max_length, min_length, cancel_event)
+        return summary, time.perf_counter() - start
+
+def cancel_speculative(future, cancel_event):
+    """Stop a summary started ahead of the verdict and record the compute it used"""
+    cancel_event.set()
+    future.cancel()
+    metrics.increment('analyze.speculative.cancelled')
+    
+    def record_waste(f):
+        if not f.cancelled() and f.exception() is None:
+            metrics.latency('analyze.wasted_compute').observe(f.result()[1])
+    
+    future.add_done_callback(record_waste)
+
 @app.route('/analyze', methods=['POST'])
 def analyze_email():
     """Analyze email for both spam detection and summarization"""
@@ -113,32 +359,309 @@ def analyze_email():
         if not email_text.strip():
             return jsonify({'error': 'Email text cannot be empty'}), 400
         
+        mode = data.get('mode', 'sequential')
+        if mode not in ANALYZE_MODES:
+            return jsonify({'error': f"mode must be one of: {', '.join(ANALYZE_MODES)}"}), 400
+        
+        force_summary = data.get('force_summary', False)
+        deadline = get_deadline(data)
+        
+        # In parallel and speculative modes, start summarizing right away,
+        # unless every executor thread is busy
+        future, cancel_event = None, None
+        if mode != 'sequential':
+            if analyze_slots.acquire(blocking=False):
+                cancel_event = threading.Event()
+                future = analyze_executor.submit(
+                    request_profiler.follow(run_summary),
+                    email_text, max_length, min_length, deadline, cancel_event
+                )
+                future.add_done_callback(lambda f: analyze_slots.release())
+            else:
+                metrics.increment('analyze.pool_saturated')
+                mode = 'sequential'
+        
+        metrics.increment(f'analyze.mode.{mode}')
+        
         # Get spam prediction
-        prediction = spam_detector.predict(email_text)
-        confidence = spam_detector.get_confidence(email_text)
+        score_start = time.perf_counter()
+        try:
+            with admission['predict'].admit(deadline):
+                clean_text = spam_detector.preprocess_text(email_text)
+                prediction, confidence, cluster, reused = score_email(clean_text)
+        except Exception:
+            if future is not None:
+                cancel_speculative(future, cancel_event)
+            raise
+        score_time = time.perf_counter() - score_start
+        
+        cached_summary = None
+        summary_key = None
+        if cluster is not None:
+            summary_key = CampaignIndex.summary_key(
+                email_summarizer.preprocess_email(email_text), max_length, min_length
+            )
+        if reused:
+            cached_summary = campaign_index.get_summary(cluster, summary_key)
         
         # Get summary only if it's not spam (or if user specifically wants it)
+        wants_summary = prediction == 'ham' or force_summary
+        if future is not None:
+            confident_spam = prediction == 'spam' and confidence >= SPECULATIVE_CANCEL_CONFIDENCE
+            if cached_summary is not None or (mode == 'speculative' and confident_spam and not force_summary):
+                cancel_speculative(future, cancel_event)
+                future = None
+            else:
+                # Already being computed, so return it even for spam
+                wants_summary = True
+        
         summary = None
-        if prediction == 'ham' or data.get('force_summary', False):
-            summary = email_summarizer.summarize(email_text, max_length, min_length)
+        degraded = None
+        if wants_summary:
+            summary = cached_summary
+            if summary is None:
+                try:
+                    if future is None and admission['summarize'].pressure() >= ANALYZE_DEGRADE_PRESSURE:
+                        # Leave the remaining queue space to /summarize callers
+                        raise Overloaded('summarize', 'pressure', 503)
+                    
+                    if future is not None:
+                        summary, summary_time = future.result()
+                        # Scoring ran in the summary's shadow
+                        metrics.latency('analyze.saved_time').observe(min(score_time, summary_time))
+                    else:
+                        summary, _ = run_summary(email_text, max_length, min_length, deadline)
+                    if cluster is not None and summary != "Error generating summary.":
+                        campaign_index.set_summary(cluster, summary_key, summary)
+                
+                except Overloaded:
+                    # Degrade instead of failing: a cheap extractive summary or spam-only
+                    degraded = 'spam_only' if data.get('degrade') == 'spam_only' else 'extractive'
+                    metrics.increment(f'analyze.degraded.{degraded}')
+                    if degraded == 'extractive':
+                        summary = email_summarizer.summarize_extractive(email_text, max_length)
+        
+        spam_detection = {
+            'prediction': prediction,
+            'confidence': float(confidence),
+            'is_spam': prediction == 'spam',
+            'campaign': campaign_info(cluster, reused)
+        }
+        
+        top_n = get_explain_top_n(data)
+        if top_n:
+            spam_detection['explanation'] = spam_detector.explain_batch([clean_text], top_n, preprocessed=True)[0]
         
         return jsonify({
-            'spam_detection': {
-                'prediction': prediction,
-                'confidence': float(confidence),
-                'is_spam': prediction == 'spam'
-            },
+            'spam_detection': spam_detection,
             'summarization': {
                 'summary': summary,
                 'original_length': len(email_text.split()),
-                'summary_length': len(summary.split()) if summary else 0
-            }
+                'summary_length': len(summary.split()) if summary else 0,
+                'degraded': degraded
+            },
+            'mode': mode
         })
         
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
         logger.error(f"Error in email analysis: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def query_flag(name):
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+def bulk_results(lines, summarize, force_summary, max_length, min_length):
+    """Score NDJSON lines chunk by chunk, yielding one NDJSON result per input line"""
+    processed = errors = 0
+    
+    for chunk in iter_chunks(lines, BULK_CHUNK_SIZE):
+        results = {}
+        emails = []
+        for line_number, raw in chunk:
+            if isinstance(raw, LineTooLong):
+                results[line_number] = {'line': line_number, 'error': str(raw)}
+                continue
+            if not raw.strip():
+                continue
+            try:
+                email_id, email_text = parse_email_line(raw)
+                emails.append((line_number, email_id, email_text))
+            except ValueError as e:
+                results[line_number] = {'line': line_number, 'error': str(e)}
+        
+        # Each chunk takes a predict slot so bulk scoring competes with
+        # interactive requests under admission control
+        verdicts, chunk_error = None, 'Internal server error'
+        if emails:
+            deadline = time.monotonic() + BULK_PREDICT_DEADLINE_MS / 1000
+            try:
+                with admission['predict'].admit(deadline):
+                    verdicts = spam_detector.predict_batch([text for _, _, text in emails])
+            except Overloaded as e:
+                chunk_error = f"Server overloaded ({e.reason})"
+            except Exception as e:
+                logger.error(f"Error in bulk prediction: {str(e)}")
+        
+        for index, (line_number, email_id, email_text) in enumerate(emails):
+            if verdicts is None:
+                results[line_number] = {'line': line_number, 'id': email_id, 'error': chunk_error}
+                continue
+            
+            prediction, confidence = verdicts[index]
+            result = {
+                'line': line_number,
+                'id': email_id,
+                'prediction': prediction,
+                'confidence': confidence,
+                'is_spam': prediction == 'spam'
+            }
+            
+            if summarize and (prediction == 'ham' or force_summary):
+                deadline = time.monotonic() + BULK_SUMMARY_DEADLINE_MS / 1000
+                try:
+                    result['summary'], _ = run_summary(email_text, max_length, min_length, deadline)
+                except Overloaded as e:
+                    result['summary'] = None
+                    result['summary_error'] = f"Server overloaded ({e.reason})"
+            
+            results[line_number] = result
+        
+        for line_number in sorted(results):
+            processed += 1
+            if 'error' in results[line_number]:
+                errors += 1
+            yield json.dumps(results[line_number]) + '\n'
+    
+    metrics.increment('bulk.lines', processed)
+    metrics.increment('bulk.errors', errors)
+    yield json.dumps({'done': True, 'processed': processed, 'errors': errors}) + '\n'
+
+@app.route('/bulk', methods=['POST'])
+def bulk_predict():
+    """Score a (optionally gzip-compressed) NDJSON stream of emails, streaming NDJSON results
+    
+    Each input line is {"id": ..., "text": ...} or a bare JSON string. Query
+    parameters: summarize, force_summary, max_length, min_length. Results
+    come back in input order as each chunk completes; bad lines get an
+    inline error instead of aborting the stream.
+    """
+    try:
+        summarize = query_flag('summarize')
+        force_summary = query_flag('force_summary')
+        max_length = int(request.args.get('max_length', 50))
+        min_length = int(request.args.get('min_length', 10))
+    except ValueError:
+        return jsonify({'error': 'max_length and min_length must be integers'}), 400
+    
+    gzipped = request.headers.get('Content-Encoding', '').lower() == 'gzip'
+    lines = iter_raw_lines(request.stream, gzipped, BULK_MAX_LINE_BYTES)
+    
+    def generate():
+        try:
+            yield from bulk_results(lines, summarize, force_summary, max_length, min_length)
+        except Exception as e:
+            # Bad gzip data or a dropped upload ends the stream
+            logger.error(f"Error in bulk processing: {str(e)}")
+            yield json.dumps({'done': False, 'error': 'Could not read request body'}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request latency metrics and counters for this worker process"""
+    return jsonify({
+        **metrics.to_dict(),
+        'admission': {name: controller.to_dict() for name, controller in admission.items()},
+        'process': {'pid': os.getpid(), **read_memory_kb()}
+    })
+
+def get_top_n():
+    """Read the 'top' query parameter for profile results; None if invalid"""
+    try:
+        top_n = int(request.args.get('top', 20))
+    except ValueError:
+        return None
+    return top_n if top_n > 0 else None
+
+@app.route('/admin/profile', methods=['POST'])
+def profile_worker():
+    """Start sampling every thread of this worker for N seconds (admin only)
+    
+    Sampling runs in the background so the worker keeps serving traffic;
+    fetch the results with GET /admin/profile.
+    """
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = float(data.get('seconds', 10))
+        interval_ms = float(data.get('interval_ms', 5))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'seconds and interval_ms must be numbers'}), 400
+    
+    seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+    interval_ms = min(max(interval_ms, MIN_PROFILE_INTERVAL_MS), MAX_PROFILE_INTERVAL_MS)
+    
+    if not worker_profiler.start(seconds, interval_ms / 1000):
+        return jsonify({'error': 'A profile is already running'}), 409
+    
+    return jsonify({'seconds': seconds, 'interval_ms': interval_ms, 'pid': os.getpid()})
+
+@app.route('/admin/profile', methods=['GET'])
+def get_worker_profile():
+    """Results of the current or last worker profile (admin only)"""
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    top_n = get_top_n()
+    if top_n is None:
+        return jsonify({'error': 'top must be a positive integer'}), 400
+    
+    return jsonify(worker_profiler.status(top_n))
+
+@app.route('/admin/profile/requests', methods=['POST'])
+def arm_request_profile():
+    """Profile the next K requests to an endpoint in this worker (admin only)"""
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    endpoint = data.get('endpoint')
+    count = data.get('count', 10)
+    
+    if endpoint not in ('/predict', '/summarize', '/summarize/stream', '/analyze', '/bulk'):
+        return jsonify({'error': 'endpoint must be a model endpoint such as /analyze'}), 400
+    if not isinstance(count, int) or count < 1:
+        return jsonify({'error': 'count must be a positive integer'}), 400
+    
+    request_profiler.arm(endpoint, count)
+    return jsonify({'endpoint': endpoint, 'count': count, 'pid': os.getpid()})
+
+@app.route('/admin/profile/requests', methods=['GET'])
+def get_request_profile():
+    """Results of the current or last request profile (admin only)"""
+    if not is_admin():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    top_n = get_top_n()
+    if top_n is None:
+        return jsonify({'error': 'top must be a positive integer'}), 400
+    
+    return jsonify(request_profiler.status(top_n))
+
+@app.route('/campaigns/stats', methods=['GET'])
+def campaign_stats():
+    """Near-duplicate campaign index statistics"""
+    try:
+        return jsonify(campaign_index.get_stats())
+    
+    except Exception as e:
+        logger.error(f"Error getting campaign stats: {str(e)}")
+        return jsonify({'error': 'Internal server error'}), 500
+
 if __name__ == '__main__':
     # Initialize models before starting the server
     initialize_models()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for email cleanup before summarization
+Compares the single-pass clean_email used by EmailSummarizer.preprocess_email
+with the previous multi-regex implementation on small and very large inputs.
+"""
+
+import argparse
+import re
+import time
+import tracemalloc
+from utils.email_cleaning import clean_email
+
+def legacy_preprocess_email(text):
+    """The previous EmailSummarizer.preprocess_email, kept for comparison"""
+    text = re.sub(r'^(To|From|Subject|Date|CC|BCC):\s*.*$', '', text, flags=re.MULTILINE)
+    text = re.sub(r'\n--\s*\n.*', '', text, flags=re.DOTALL)
+    text = re.sub(r'\nBest regards.*', '', text, flags=re.DOTALL)
+    text = re.sub(r'\nSincerely.*', '', text, flags=re.DOTALL)
+    text = re.sub(r'\nThanks.*', '', text, flags=re.DOTALL)
+    text = re.sub(r'http\S+|www\.\S+', '', text)
+    text = re.sub(r'\S+@\S+', '', text)
+    text = re.sub(r'\n+', ' ', text)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^\w\s.,!?-]', '', text)
+    return text.strip()
+
+PARAGRAPH = (
+    "We reviewed the quarterly numbers with finance on Tuesday and the results "
+    "look better than forecast, although infrastructure costs at https://cost.example.com "
+    "came in above plan. Please send questions to ops@example.com before Friday.\n"
+)
+
+def plain_email(size):
+    return "Subject: Quarterly review\n\nHi team,\n" + PARAGRAPH * (size // len(PARAGRAPH))
+
+def single_line(size):
+    """A large paste with no line breaks at all"""
+    return "Hi team, " + PARAGRAPH.replace('\n', ' ') * (size // len(PARAGRAPH))
+
+def forwarded_thread(size):
+    block = (
+        "Thanks for the update, see my notes inline.\n"
+        "On Mon, 2 Oct 2023 at 10:00, Alice <alice@example.com> wrote:\n"
+        + "> " + PARAGRAPH
+    )
+    return "Looping in the wider team.\n\n" + block * (size // len(block))
+
+def html_message(size):
+    body = "<p>" + PARAGRAPH + "</p>"
+    html = "<html><head><style>p { color: #333; }</style></head><body>" + body * (size // len(body)) + "</body></html>"
+    return (
+        "From: Alice <alice@example.com>\n"
+        "To: team@example.com\n"
+        "Subject: Weekly report\n"
+        "MIME-Version: 1.0\n"
+        "Content-Type: text/html; charset=utf-8\n"
+        "\n" + html
+    )
+
+def measure(func, text, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return best, peak
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description='Compare email cleanup implementations')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2_000, 100_000, 1_000_000, 5_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("EMAIL PREPROCESSING BENCHMARK")
+    print("=" * 60)
+
+    cases = [
+        ('plain', plain_email),
+        ('single line', single_line),
+        ('forwarded thread', forwarded_thread),
+        ('html message', html_message)
+    ]
+    for name, make in cases:
+        for size in args.sizes:
+            text = make(size)
+            legacy_time, legacy_peak = measure(legacy_preprocess_email, text, args.repeat)
+            new_time, new_peak = measure(clean_email, text, args.repeat)
+
+            print(f"{name}, {len(text) / 1024:.0f} KB")
+            print(f"  legacy:      {legacy_time * 1000:9.2f} ms, peak {legacy_peak / 1024:9.0f} KB")
+            print(f"  clean_email: {new_time * 1000:9.2f} ms, peak {new_peak / 1024:9.0f} KB")
+            print("-" * 50)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for multi-process serving
+Starts gunicorn with 1..N workers, drives /analyze with concurrent clients and
+reports aggregate throughput and per-worker RSS/PSS for each worker count.
+Only full model summaries count as throughput; degraded (extractive) responses
+and requests refused by admission control are reported separately.
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from utils.serving import available_cpus, plan_topology, read_memory_kb
+
+SAMPLE_EMAIL = (
+    "Subject: Quarterly planning\n\n"
+    "Hi team, please review the attached budget proposal before Thursday's meeting. "
+    "We will discuss hiring plans, the product roadmap for next quarter and the "
+    "infrastructure costs that came in above forecast last month. Let me know if "
+    "you need more time to prepare."
+)
+
+def post(url, payload):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}
+    )
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read())
+
+def wait_until_ready(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{url}/health", timeout=2).read()
+            return True
+        except OSError:
+            time.sleep(1)
+    return False
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+def run(workers, args):
+    port = args.port
+    url = f"http://127.0.0.1:{port}"
+    env = {**os.environ, 'WEB_WORKERS': str(workers), 'PORT': str(port)}
+    # Let every client queue for a summary instead of being degraded early;
+    # WEB_THREADS follows the queue size by default
+    env['ANALYZE_DEGRADE_PRESSURE'] = '1'
+    env['SUMMARIZE_QUEUE'] = str(max(args.clients, int(os.environ.get('SUMMARIZE_QUEUE', 8))))
+    if args.affinity:
+        env['WORKER_CPU_AFFINITY'] = '1'
+
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    try:
+        if not wait_until_ready(url, args.startup_timeout):
+            print(f"{workers} workers: server did not become ready")
+            return None
+
+        payload = {'text': SAMPLE_EMAIL, 'force_summary': True}
+        start = time.perf_counter()
+
+        def client():
+            counts = {'completed': 0, 'degraded': 0, 'rejected': 0, 'errors': 0}
+            while time.perf_counter() - start < args.duration:
+                try:
+                    result = post(f"{url}/analyze", payload)
+                except urllib.error.HTTPError as e:
+                    counts['rejected' if e.code in (429, 503) else 'errors'] += 1
+                    continue
+                except OSError:
+                    counts['errors'] += 1
+                    continue
+
+                if result['summarization']['degraded'] is None:
+                    counts['completed'] += 1
+                else:
+                    counts['degraded'] += 1
+            return counts
+
+        totals = {'completed': 0, 'degraded': 0, 'rejected': 0, 'errors': 0}
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            for counts in pool.map(lambda _: client(), range(args.clients)):
+                for key, value in counts.items():
+                    totals[key] += value
+        elapsed = time.perf_counter() - start
+
+        memory = [read_memory_kb(pid) for pid in child_pids(server.pid)]
+        parent = read_memory_kb(server.pid)
+        return {
+            'workers': workers,
+            'throughput': totals['completed'] / elapsed,
+            **totals,
+            'parent_rss_mb': (parent['rss_kb'] or 0) / 1024,
+            'worker_rss_mb': [(m['rss_kb'] or 0) / 1024 for m in memory],
+            'worker_pss_mb': [(m['pss_kb'] or 0) / 1024 for m in memory]
+        }
+
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+def main():
+    """Main benchmark function"""
+    parser = argparse.ArgumentParser(description='Throughput and memory for 1..N gunicorn workers')
+    parser.add_argument('--max-workers', type=int, default=len(available_cpus()))
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds per worker count')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--startup-timeout', type=float, default=180.0)
+    parser.add_argument('--affinity', action='store_true', help='pin workers to cores')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("MULTI-WORKER SERVING BENCHMARK")
+    print("=" * 60)
+
+    for workers in range(1, args.max_workers + 1):
+        try:
+            plan_topology(workers)
+        except ValueError as e:
+            print(f"{workers} workers: skipped ({e})")
+            continue
+
+        result = run(workers, args)
+        if result is None:
+            continue
+
+        rss = ', '.join(f"{r:.0f}" for r in result['worker_rss_mb'])
+        pss = ', '.join(f"{p:.0f}" for p in result['worker_pss_mb'])
+        print(f"{workers} workers: {result['throughput']:.2f} req/s")
+        print(f"  completed: {result['completed']}, degraded: {result['degraded']}, "
+              f"rejected: {result['rejected']}, errors: {result['errors']}")
+        print(f"  parent RSS: {result['parent_rss_mb']:.0f} MB")
+        print(f"  worker RSS (MB): {rss}")
+        print(f"  worker PSS (MB): {pss}")
+        print("-" * 50)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Evaluation script for the near-duplicate campaign index
+Streams the labelled spam_ham_dataset.csv (plus perturbed campaign copies)
+through CampaignIndex and measures how often a reused verdict agrees with
+full SpamDetector scoring and with the true label.
+"""
+
+import argparse
+import random
+import re
+import time
+from models.spam_detector import SpamDetector
+from models.campaign_index import CampaignIndex
+
+FIRST_NAMES = ['john', 'maria', 'wei', 'fatima', 'carlos', 'anna', 'raj', 'olga']
+
+def perturb(text, rng):
+    """Make a campaign-style copy: new numbers, greeting name and tracking URL"""
+    text = re.sub(r'\d+', lambda m: str(rng.randint(0, 10 ** len(m.group()))), text)
+    text = re.sub(r'http\S+', f'http://track.example.com/{rng.randint(0, 10 ** 6)}', text)
+    return f"Dear {rng.choice(FIRST_NAMES)}, {text}"
+
+def main():
+    """Main evaluation function"""
+    parser = argparse.ArgumentParser(description='Measure precision of reused campaign verdicts')
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--copies', type=int, default=3, help='perturbed copies per email')
+    parser.add_argument('--limit', type=int, default=2000, help='max emails from the dataset')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("CAMPAIGN INDEX VERDICT REUSE EVALUATION")
+    print("=" * 60)
+
+    rng = random.Random(args.seed)
+    detector = SpamDetector()
+    df = detector.load_data()
+
+    if 'text' not in df.columns:
+        print("Dataset not found; cannot evaluate without labelled emails.")
+        return
+
+    df = df.head(args.limit)
+    stream = []
+    for text, label in zip(df['text'], df['label_num']):
+        stream.append((text, label))
+        stream.extend((perturb(text, rng), label) for _ in range(args.copies))
+    rng.shuffle(stream)
+
+    index = CampaignIndex(threshold=args.threshold, ttl_seconds=None)
+    reused = agree_model = agree_label = 0
+    model_correct = 0
+    lookup_time = score_time = 0.0
+
+    for text, label in stream:
+        start = time.perf_counter()
+        cluster, similarity, signature = index.lookup(detector.preprocess_text(text))
+        lookup_time += time.perf_counter() - start
+
+        # Full scoring for every email, to compare reused verdicts against
+        start = time.perf_counter()
+        prediction = detector.predict(text)
+        score_time += time.perf_counter() - start
+        model_correct += int((prediction == 'spam') == bool(label))
+
+        if cluster is None:
+            index.add(signature, prediction, detector.get_confidence(text))
+            continue
+
+        reused += 1
+        agree_model += int(cluster.prediction == prediction)
+        agree_label += int((cluster.prediction == 'spam') == bool(label))
+
+    total = len(stream)
+    print(f"Emails scored: {total}")
+    print(f"Verdicts reused: {reused} ({reused / total:.1%})")
+    if reused:
+        print(f"Reuse precision vs full scoring: {agree_model / reused:.4f}")
+        print(f"Reuse accuracy vs labels: {agree_label / reused:.4f}")
+    print(f"Full scoring accuracy vs labels: {model_correct / total:.4f}")
+    print(f"Mean lookup time: {lookup_time / total * 1000:.3f} ms")
+    print(f"Mean full scoring time: {score_time / total * 1000:.3f} ms")
+
+    stats = index.get_stats(top_n=5)
+    print(f"Clusters: {stats['clusters']}")
+    for cluster in stats['largest_clusters']:
+        print(f"  #{cluster['cluster_id']}: {cluster['size']} emails, {cluster['prediction']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Gunicorn configuration for serving the API with several worker processes
+
+Environment variables:
+- WEB_WORKERS: number of worker processes (default 2)
+- WEB_THREADS: request threads per worker (default: enough to fill the
+  admission queues, see utils.admission.required_request_threads)
+- TORCH_THREADS_PER_WORKER: torch intra-op threads per worker
+  (default: available cores divided by workers)
+- WORKER_CPU_AFFINITY: set to 1 to pin each worker to its own cores
+- PORT: port to bind (default 5000)
+
+Startup fails if workers x torch threads exceeds the available cores, or if
+WEB_THREADS is too small for the admission queues to ever fill.
+"""
+
+import os
+from utils.serving import plan_topology
+from utils.admission import required_request_threads
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_WORKERS', 2))
+worker_class = 'gthread'
+
+# Request threads per worker. Model work is bounded inside the app, so extra
+# threads only let requests wait (and be shed) in the app instead of queueing
+# invisibly in gunicorn's accept backlog.
+_required_threads = required_request_threads()
+threads = int(os.environ.get('WEB_THREADS', _required_threads))
+if threads < _required_threads:
+    raise ValueError(
+        f"WEB_THREADS={threads} is below the {_required_threads} request threads the "
+        "admission limits need; requests would queue in gunicorn and never be shed"
+    )
+
+# Load models once in the parent before forking
+preload_app = True
+
+# Summaries can take a while on long emails
+timeout = 120
+
+_threads_env = os.environ.get('TORCH_THREADS_PER_WORKER')
+torch_threads, core_sets = plan_topology(workers, int(_threads_env) if _threads_env else None)
+cpu_affinity = os.environ.get('WORKER_CPU_AFFINITY', '0') == '1'
+
+def pre_fork(server, worker):
+    """Give the new worker the lowest free slot so it gets a stable core set"""
+    used = {getattr(w, 'slot', None) for w in server.WORKERS.values()}
+    worker.slot = next(i for i in range(len(core_sets)) if i not in used)
+
+def post_fork(server, worker):
+    """Limit torch threads and optionally pin the worker to its cores"""
+    import torch
+
+    torch.set_num_threads(torch_threads)
+
+    if cpu_affinity and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, core_sets[worker.slot])
+
+    server.log.info(
+        f"Worker {worker.pid} (slot {worker.slot}): {torch_threads} torch threads"
+        + (f", cores {sorted(core_sets[worker.slot])}" if cpu_affinity else "")
+    )
@@ -0,0 +1,254 @@
+import numpy as np
+import hashlib
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# Mersenne prime used for the MinHash permutations
+_PRIME = np.uint64((1 << 61) - 1)
+_SHIFT_61 = np.uint64(61)
+_SHIFT_32 = np.uint64(32)
+_SHIFT_29 = np.uint64(29)
+_LOW_32 = np.uint64((1 << 32) - 1)
+_LOW_29 = np.uint64((1 << 29) - 1)
+
+# Distinct cached summaries kept per cluster
+MAX_SUMMARIES_PER_CLUSTER = 32
+
+
+def _mod_prime(values):
+    """Exact values mod 2**61 - 1 for uint64 arrays"""
+    values = (values & _PRIME) + (values >> _SHIFT_61)
+    return np.where(values >= _PRIME, values - _PRIME, values)
+
+
+class CampaignCluster:
+    """A group of near-identical emails sharing one verdict"""
+
+    def __init__(self, cluster_id, signature, prediction, confidence):
+        self.cluster_id = cluster_id
+        self.signature = signature
+        self.prediction = prediction
+        self.confidence = confidence
+        self.summaries = OrderedDict()
+        self.size = 1
+        self.created_at = time.time()
+        self.last_seen = self.created_at
+
+    def to_dict(self):
+        return {
+            'cluster_id': self.cluster_id,
+            'prediction': self.prediction,
+            'confidence': float(self.confidence),
+            'size': self.size,
+            'age_seconds': round(time.time() - self.created_at, 1)
+        }
+
+
+class CampaignIndex:
+    """MinHash/LSH index of recently scored emails
+
+    Emails are shingled on the output of SpamDetector.preprocess_text, so
+    copies of a campaign that differ only in names, numbers or URLs map to
+    the same cluster and can reuse its verdict. Summaries are only reused for
+    exact matches of the summarizer's cleaned text, which keeps those details.
+    """
+
+    def __init__(self, num_perm=64, bands=16, shingle_size=3, threshold=0.8,
+                 max_clusters=10000, ttl_seconds=3600, seed=42):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.max_clusters = max_clusters
+        self.ttl_seconds = ttl_seconds
+
+        # h(x) = (a * x + b) mod p with a in [1, p) and b in [0, p); a is
+        # kept as 32-bit limbs so the product can be reduced exactly
+        rng = np.random.RandomState(seed)
+        a = rng.randint(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._a_hi = (a >> _SHIFT_32)[:, None]
+        self._a_lo = (a & _LOW_32)[:, None]
+        self._b = rng.randint(0, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+
+        self._clusters = OrderedDict()
+        self._buckets = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'lookups': 0,
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0
+        }
+
+    def shingles(self, clean_text):
+        """Word n-gram shingles of preprocessed text"""
+        words = clean_text.split()
+        if len(words) < self.shingle_size:
+            return {' '.join(words)} if words else set()
+
+        n = self.shingle_size
+        return {' '.join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+    def signature(self, clean_text):
+        """MinHash signature, or None if the text has no shingles"""
+        shingles = self.shingles(clean_text)
+        if not shingles:
+            return None
+
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+
+        # (a * x + b) mod p for every permutation and shingle. With
+        # a = a_hi * 2**32 + a_lo and x < 2**32 both partial products fit in
+        # 64 bits, and 2**61 = 1 (mod p) folds the high one back down.
+        high = self._a_hi * hashes
+        high = (high >> _SHIFT_29) + ((high & _LOW_29) << _SHIFT_32)
+        low = self._a_lo * hashes
+        permuted = _mod_prime(_mod_prime(high) + _mod_prime(low) + self._b)
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature):
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _remove(self, cluster_id):
+        cluster = self._clusters.pop(cluster_id)
+        for key in self._band_keys(cluster.signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(cluster_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _is_expired(self, cluster, now):
+        return self.ttl_seconds is not None and now - cluster.created_at > self.ttl_seconds
+
+    def lookup(self, clean_text):
+        """Find a live cluster similar to the text
+
+        Returns (cluster, similarity, signature). The cluster is None on a
+        miss; the signature can be passed to add() to avoid recomputing it.
+        """
+        signature = self.signature(clean_text)
+
+        with self._lock:
+            self.stats['lookups'] += 1
+
+            if signature is None:
+                self.stats['misses'] += 1
+                return None, 0.0, None
+
+            now = time.time()
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+
+            best, best_similarity = None, 0.0
+            for cluster_id in candidates:
+                cluster = self._clusters[cluster_id]
+                if self._is_expired(cluster, now):
+                    self._remove(cluster_id)
+                    self.stats['expirations'] += 1
+                    continue
+
+                similarity = float(np.mean(cluster.signature == signature))
+                if similarity > best_similarity:
+                    best, best_similarity = cluster, similarity
+
+            if best is None or best_similarity < self.threshold:
+                self.stats['misses'] += 1
+                return None, best_similarity, signature
+
+            best.size += 1
+            best.last_seen = now
+            self._clusters.move_to_end(best.cluster_id)
+            self.stats['hits'] += 1
+
+            return best, best_similarity, signature
+
+    def add(self, signature, prediction, confidence):
+        """Start a new cluster from a fully scored email"""
+        if signature is None:
+            return None
+
+        with self._lock:
+            # Evict least recently seen clusters to stay within the bound
+            while len(self._clusters) >= self.max_clusters:
+                oldest_id = next(iter(self._clusters))
+                self._remove(oldest_id)
+                self.stats['evictions'] += 1
+
+            cluster = CampaignCluster(self._next_id, signature, prediction, confidence)
+            self._next_id += 1
+
+            self._clusters[cluster.cluster_id] = cluster
+            for key in self._band_keys(signature):
+                self._buckets.setdefault(key, set()).add(cluster.cluster_id)
+
+            return cluster
+
+    @staticmethod
+    def summary_key(clean_email, max_length, min_length):
+        """Cache key for a summary: exact hash of the summarizer's cleaned text
+
+        The cleaned text keeps the numbers, names and dates that
+        preprocess_text strips, so two transactional emails in one cluster
+        never share a summary.
+        """
+        digest = hashlib.sha1(clean_email.encode('utf-8')).hexdigest()
+        return digest, max_length, min_length
+
+    def get_summary(self, cluster, key):
+        """Cached summary for an exact cleaned-text match within the cluster"""
+        with self._lock:
+            return cluster.summaries.get(key)
+
+    def set_summary(self, cluster, key, summary):
+        """Store a summary so later exact copies in the cluster can reuse it"""
+        with self._lock:
+            cluster.summaries[key] = summary
+            cluster.summaries.move_to_end(key)
+            while len(cluster.summaries) > MAX_SUMMARIES_PER_CLUSTER:
+                cluster.summaries.popitem(last=False)
+
+    def purge_expired(self):
+        """Drop every cluster older than the TTL"""
+        with self._lock:
+            now = time.time()
+            expired = [cid for cid, c in self._clusters.items() if self._is_expired(c, now)]
+            for cluster_id in expired:
+                self._remove(cluster_id)
+            self.stats['expirations'] += len(expired)
+            return len(expired)
+
+    def get_stats(self, top_n=10):
+        """Index counters and the largest live clusters"""
+        self.purge_expired()
+
+        with self._lock:
+            lookups = self.stats['lookups']
+            largest = sorted(self._clusters.values(), key=lambda c: c.size, reverse=True)[:top_n]
+
+            return {
+                **self.stats,
+                'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+                'clusters': len(self._clusters),
+                'max_clusters': self.max_clusters,
+                'ttl_seconds': self.ttl_seconds,
+                'threshold': self.threshold,
+                'largest_clusters': [c.to_dict() for c in largest]
+            }
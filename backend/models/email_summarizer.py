@@ -1,7 +1,22 @@
-from transformers import T5ForConditionalGeneration, T5Tokenizer
+from transformers import (
+    T5ForConditionalGeneration, T5Tokenizer, TextIteratorStreamer,
+    StoppingCriteria, StoppingCriteriaList
+)
+from threading import Thread, Event
+from utils.email_cleaning import clean_email, DEFAULT_MAX_WORDS, SNIFF_CHARS
 import torch
 import re
 import os
+import time
+
+class CancelCriteria(StoppingCriteria):
+    """Stop generation as soon as a threading.Event is set"""
+    
+    def __init__(self, cancel_event):
+        self.cancel_event = cancel_event
+    
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.cancel_event.is_set()
 
 class EmailSummarizer:
     def __init__(self, model_name='t5-small'):
@@ -25,61 +40,68 @@ class EmailSummarizer:
             raise e
     
     def preprocess_email(self, text):
-        """Clean and preprocess email text for summarization"""
-        # Remove email headers pattern (To:, From:, Subject:, etc.)
-        text = re.sub(r'^(To|From|Subject|Date|CC|BCC):\s*.*$', '', text, flags=re.MULTILINE)
-        
-        # Remove email signatures (common patterns)
-        text = re.sub(r'\n--\s*\n.*', '', text, flags=re.DOTALL)
-        text = re.sub(r'\nBest regards.*', '', text, flags=re.DOTALL)
-        text = re.sub(r'\nSincerely.*', '', text, flags=re.DOTALL)
-        text = re.sub(r'\nThanks.*', '', text, flags=re.DOTALL)
-        
-        # Remove URLs
-        text = re.sub(r'http\S+|www\.\S+', '', text)
+        """Clean and preprocess email text for summarization
         
-        # Remove email addresses
-        text = re.sub(r'\S+@\S+', '', text)
-        
-        # Remove excessive whitespace and newlines
-        text = re.sub(r'\n+', ' ', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Remove special characters but keep basic punctuation
-        text = re.sub(r'[^\w\s.,!?-]', '', text)
-        
-        return text.strip()
+        Stops once enough words have been collected to fill the tokenizer's
+        512-token input, so very large pasted emails stay cheap.
+        """
+        return clean_email(text, max_words=DEFAULT_MAX_WORDS)
     
     def extract_subject(self, text):
         """Extract subject line from email text"""
-        subject_match = re.search(r'Subject:\s*(.+)', text, re.IGNORECASE)
+        # Headers are at the top; don't scan the whole of a huge email
+        subject_match = re.search(r'Subject:\s*(.+)', text[:SNIFF_CHARS], re.IGNORECASE)
         if subject_match:
             return subject_match.group(1).strip()
         return None
     
-    def summarize(self, text, max_length=50, min_length=10):
-        """Generate summary of email text"""
+    def prepare_input(self, text, min_length=10):
+        """Extract the subject, clean the text and tokenize it for T5
+        
+        Returns (subject, clean_text, inputs); inputs is None when the text is
+        too short to be worth summarizing.
+        """
+        # Extract subject if available
+        subject = self.extract_subject(text)
+        
+        # Preprocess the email text
+        clean_text = self.preprocess_email(text)
+        
+        # If text is too short, there is nothing to generate
+        if len(clean_text.split()) <= min_length:
+            return subject, clean_text, None
+        
+        # Prepare input for T5 (T5 requires task prefix)
+        input_text = f"summarize: {clean_text}"
+        
+        # Tokenize input
+        inputs = self.tokenizer.encode(
+            input_text,
+            return_tensors='pt',
+            max_length=512,
+            truncation=True
+        ).to(self.device)
+        
+        return subject, clean_text, inputs
+    
+    def summarize(self, text, max_length=50, min_length=10, cancel_event=None):
+        """Generate summary of email text
+        
+        If cancel_event (a threading.Event) is set while generating, beam search
+        stops at the next step and None is returned.
+        """
         try:
-            # Extract subject if available
-            subject = self.extract_subject(text)
-            
-            # Preprocess the email text
-            clean_text = self.preprocess_email(text)
+            subject, clean_text, inputs = self.prepare_input(text, min_length)
             
             # If text is too short, return as is
-            if len(clean_text.split()) <= min_length:
+            if inputs is None:
                 return clean_text if clean_text else "Email content too short to summarize."
             
-            # Prepare input for T5 (T5 requires task prefix)
-            input_text = f"summarize: {clean_text}"
-            
-            # Tokenize input
-            inputs = self.tokenizer.encode(
-                input_text,
-                return_tensors='pt',
-                max_length=512,
-                truncation=True
-            ).to(self.device)
+            stopping_criteria = None
+            if cancel_event is not None:
+                if cancel_event.is_set():
+                    return None
+                stopping_criteria = StoppingCriteriaList([CancelCriteria(cancel_event)])
             
             # Generate summary
             with torch.no_grad():
@@ -90,9 +112,13 @@ class EmailSummarizer:
                     num_beams=4,
                     length_penalty=2.0,
                     early_stopping=True,
-                    no_repeat_ngram_size=2
+                    no_repeat_ngram_size=2,
+                    stopping_criteria=stopping_criteria
                 )
             
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            
             # Decode summary
             summary = self.tokenizer.decode(summary_ids[0], skip_special_tokens=True)
             
@@ -105,6 +131,110 @@ class EmailSummarizer:
             print(f"Error in summarization: {e}")
             return "Error generating summary."
     
+    def summarize_stream(self, text, max_length=50, min_length=10, cancel_event=None, wrap_thread=None):
+        """Generate a summary incrementally
+        
+        Yields ('token', text) events as decoded text becomes available, then a
+        single ('done', result) event with the post-processed summary, stats and
+        time to first token. Streaming cannot be combined with beam search, so
+        this uses greedy decoding. If generation fails, the error is raised
+        instead of the 'done' event.
+        
+        Setting cancel_event, or closing the generator early, stops generation
+        at the next step; close() returns only once the model has stopped.
+        wrap_thread, if given, wraps the generation thread's target (the
+        request profiler uses it to follow the work onto that thread).
+        """
+        cancel_event = cancel_event or Event()
+        start = time.perf_counter()
+        subject, clean_text, inputs = self.prepare_input(text, min_length)
+        
+        if inputs is None:
+            summary = clean_text if clean_text else "Email content too short to summarize."
+            elapsed = time.perf_counter() - start
+            yield 'token', summary
+            yield 'done', {
+                'summary': summary,
+                'stats': self.get_summary_stats(text, summary),
+                'time_to_first_token': elapsed,
+                'total_time': elapsed
+            }
+            return
+        
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors = []
+        
+        def generate():
+            try:
+                with torch.no_grad():
+                    self.model.generate(
+                        inputs,
+                        max_length=max_length + 10,  # Add buffer for decoding
+                        min_length=min_length,
+                        num_beams=1,
+                        no_repeat_ngram_size=2,
+                        streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList([CancelCriteria(cancel_event)])
+                    )
+            except Exception as e:
+                print(f"Error in streaming summarization: {e}")
+                # Re-raised in the consumer once the loop below is unblocked
+                errors.append(e)
+                streamer.end()
+        
+        if wrap_thread is not None:
+            generate = wrap_thread(generate)
+        
+        thread = Thread(target=generate, daemon=True)
+        thread.start()
+        
+        pieces = []
+        time_to_first_token = None
+        try:
+            for piece in streamer:
+                if not piece:
+                    continue
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start
+                pieces.append(piece)
+                yield 'token', piece
+        finally:
+            # Stop the model if the consumer went away before the end
+            if thread.is_alive():
+                cancel_event.set()
+            thread.join()
+        
+        if errors:
+            raise errors[0]
+        
+        summary = self.post_process_summary(''.join(pieces), subject)
+        total_time = time.perf_counter() - start
+        
+        yield 'done', {
+            'summary': summary,
+            'stats': self.get_summary_stats(text, summary),
+            'time_to_first_token': time_to_first_token if time_to_first_token is not None else total_time,
+            'total_time': total_time
+        }
+    
+    def summarize_extractive(self, text, max_length=50):
+        """Cheap fallback summary: leading sentences of the cleaned email, no model call"""
+        subject = self.extract_subject(text)
+        clean_text = self.preprocess_email(text)
+        
+        if not clean_text:
+            return "Email content too short to summarize."
+        
+        # Take whole sentences until the word budget is used up
+        words = []
+        for sentence in re.split(r'(?<=[.!?])\s+', clean_text):
+            sentence_words = sentence.split()
+            if words and len(words) + len(sentence_words) > max_length:
+                break
+            words.extend(sentence_words[:max_length - len(words)])
+        
+        return self.post_process_summary(' '.join(words), subject)
+    
     def post_process_summary(self, summary, subject=None):
         """Post-process the generated summary"""
         # Remove common T5 artifacts
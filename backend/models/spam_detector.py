@@ -29,6 +29,7 @@ class SpamDetector:
         self.vectorizer_path = vectorizer_path
         self.model = None
         self.vectorizer = None
+        self._feature_names = None
         self.stemmer = PorterStemmer()
         self.stop_words = set(stopwords.words('english'))
         
@@ -115,6 +116,8 @@ class SpamDetector:
             min_df=2
         )
         
+        self._feature_names = None
+        
         # Fit and transform the training data
         X_train_tfidf = self.vectorizer.fit_transform(X_train)
         X_test_tfidf = self.vectorizer.transform(X_test)
@@ -163,6 +166,8 @@ class SpamDetector:
             
             with open(self.vectorizer_path, 'rb') as f:
                 self.vectorizer = pickle.load(f)
+            
+            self._feature_names = None
                 
             print("Model and vectorizer loaded successfully!")
             
@@ -209,45 +214,92 @@ class SpamDetector:
         # Return the maximum probability as confidence
         return max(probabilities)
     
-    def get_feature_importance(self, text, top_n=10):
-        """Get the most important features for a prediction"""
+    def predict_batch(self, texts, preprocessed=False):
+        """Predict labels and confidences for several texts with one vectorizer call
+        
+        Returns a list of (prediction, confidence) pairs, matching predict()
+        and get_confidence() for each text. Pass preprocessed=True if the
+        texts are already the output of preprocess_text().
+        """
         if self.model is None or self.vectorizer is None:
             raise ValueError("Model not trained or loaded")
         
-        # Preprocess the text
-        clean_text = self.preprocess_text(text)
+        clean_texts = texts if preprocessed else [self.preprocess_text(text) for text in texts]
         
-        if not clean_text:
-            return []
+        # Default to ham with neutral confidence for empty text
+        results = [('ham', 0.5)] * len(clean_texts)
         
-        # Transform text using TF-IDF
-        text_tfidf = self.vectorizer.transform([clean_text])
+        present = [i for i, clean_text in enumerate(clean_texts) if clean_text]
+        if not present:
+            return results
         
-        # Get feature names
-        feature_names = self.vectorizer.get_feature_names_out()
+        text_tfidf = self.vectorizer.transform([clean_texts[i] for i in present])
+        probabilities = self.model.predict_proba(text_tfidf)
+        classes = self.model.classes_
         
-        # Get TF-IDF scores
-        tfidf_scores = text_tfidf.toarray()[0]
+        for row, i in enumerate(present):
+            best = int(np.argmax(probabilities[row]))
+            prediction = 'spam' if classes[best] == 1 else 'ham'
+            results[i] = (prediction, float(probabilities[row][best]))
         
-        # Get model coefficients
-        coef = self.model.coef_[0]
+        return results
+    
+    @property
+    def feature_names(self):
+        """Vocabulary lookup table, built once per loaded vectorizer"""
+        if self._feature_names is None:
+            self._feature_names = self.vectorizer.get_feature_names_out()
+        return self._feature_names
+    
+    def explain_batch(self, texts, top_n=10, preprocessed=False):
+        """Get the most important features for a batch of predictions
+        
+        Only the non-zero entries of each sparse TF-IDF row are scored, so the
+        cost depends on the number of terms in the email rather than the size
+        of the vocabulary.
+        """
+        if self.model is None or self.vectorizer is None:
+            raise ValueError("Model not trained or loaded")
+        
+        clean_texts = texts if preprocessed else [self.preprocess_text(text) for text in texts]
+        explanations = [[] for _ in clean_texts]
         
-        # Calculate feature importance (TF-IDF * coefficient)
-        importance_scores = tfidf_scores * coef
+        # Vectorize all non-empty texts in one call
+        present = [i for i, clean_text in enumerate(clean_texts) if clean_text]
+        if not present or top_n <= 0:
+            return explanations
         
-        # Get top features
-        top_indices = np.argsort(np.abs(importance_scores))[-top_n:][::-1]
+        text_tfidf = self.vectorizer.transform([clean_texts[i] for i in present]).tocsr()
+        feature_names = self.feature_names
+        coef = self.model.coef_[0]
         
-        top_features = []
-        for idx in top_indices:
-            if tfidf_scores[idx] > 0:  # Only include features present in the text
-                top_features.append({
-                    'feature': feature_names[idx],
-                    'importance': float(importance_scores[idx]),
-                    'tfidf_score': float(tfidf_scores[idx])
-                })
+        for row, i in enumerate(present):
+            start, end = text_tfidf.indptr[row], text_tfidf.indptr[row + 1]
+            indices = text_tfidf.indices[start:end]
+            tfidf_scores = text_tfidf.data[start:end]
+            
+            # Calculate feature importance (TF-IDF * coefficient)
+            importance_scores = tfidf_scores * coef[indices]
+            magnitudes = np.abs(importance_scores)
+            
+            # Partial selection of the top features, then order just those
+            if len(indices) > top_n:
+                top = np.argpartition(magnitudes, -top_n)[-top_n:]
+            else:
+                top = np.arange(len(indices))
+            top = top[np.argsort(magnitudes[top])[::-1]]
+            
+            explanations[i] = [{
+                'feature': str(feature_names[indices[j]]),
+                'importance': float(importance_scores[j]),
+                'tfidf_score': float(tfidf_scores[j])
+            } for j in top]
         
-        return top_features
+        return explanations
+    
+    def get_feature_importance(self, text, top_n=10):
+        """Get the most important features for a prediction"""
+        return self.explain_batch([text], top_n)[0]
 
 # Test the model if run directly
 if __name__ == "__main__":
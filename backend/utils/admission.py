@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+def admission_limits():
+    """Per-worker admission limits from the environment
+
+    Shared by app.py and gunicorn.conf.py so the request thread count always
+    matches the queues it has to feed.
+    """
+    return {
+        'predict_concurrency': int(os.environ.get('PREDICT_CONCURRENCY', 4)),
+        'predict_queue': int(os.environ.get('PREDICT_QUEUE', 64)),
+        'summarize_concurrency': int(os.environ.get('SUMMARIZE_CONCURRENCY', 1)),
+        'summarize_queue': int(os.environ.get('SUMMARIZE_QUEUE', 8))
+    }
+
+def required_request_threads(limits=None):
+    """Request threads a worker needs for the summarize queue to fill while predictions still run
+
+    With fewer threads, excess requests wait in the server's accept backlog
+    where they can never be shed or degraded.
+    """
+    limits = limits or admission_limits()
+    return limits['predict_concurrency'] + limits['summarize_concurrency'] + limits['summarize_queue']
+
+class Overloaded(Exception):
+    """Raised when a request is rejected or shed by admission control"""
+
+    def __init__(self, endpoint, reason, status_code, retry_after=1):
+        super().__init__(f"{endpoint}: {reason}")
+        self.endpoint = endpoint
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Bounded queue in front of one endpoint's model work
+
+    At most max_concurrency requests run at once and at most max_queue wait.
+    A request is refused up front if the queue is full (429) or if the
+    estimated wait plus service time would overrun its deadline (503). A
+    queued request whose deadline passes before it gets a slot is cancelled
+    (503) instead of running for a caller that has already given up.
+    """
+
+    def __init__(self, name, max_concurrency=1, max_queue=8, initial_service_time=1.0,
+                 metrics=None, smoothing=0.2):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.service_time = initial_service_time
+        self.smoothing = smoothing
+        self.metrics = metrics
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def _count(self, event):
+        if self.metrics is not None:
+            self.metrics.increment(f'admission.{self.name}.{event}')
+
+    def _reject(self, reason, status_code):
+        self._count(reason)
+        retry_after = max(1, int(self.estimated_wait() + 0.5))
+        raise Overloaded(self.name, reason, status_code, retry_after)
+
+    def estimated_wait(self):
+        """Seconds a newly queued request would wait for a slot"""
+        ahead = self.waiting + self.in_flight - self.max_concurrency + 1
+        return max(0, ahead) / self.max_concurrency * self.service_time
+
+    def pressure(self):
+        """Fraction of the queue in use"""
+        return self.waiting / self.max_queue if self.max_queue else 1.0
+
+    def acquire(self, deadline):
+        """Wait for a slot; deadline is a time.monotonic() timestamp
+
+        Returns the start time to pass to release().
+        """
+        with self._cond:
+            if self.waiting >= self.max_queue:
+                self._reject('rejected', 429)
+
+            if time.monotonic() + self.estimated_wait() + self.service_time > deadline:
+                self._reject('shed', 503)
+
+            self.waiting += 1
+            try:
+                while self.in_flight >= self.max_concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject('cancelled', 503)
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+
+            self.in_flight += 1
+            self._count('admitted')
+
+        return time.monotonic()
+
+    def release(self, started):
+        """Free the slot and fold the observed service time into the estimate"""
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self.in_flight -= 1
+            self.service_time += self.smoothing * (elapsed - self.service_time)
+            self._cond.notify_all()
+
+    @contextmanager
+    def admit(self, deadline):
+        started = self.acquire(deadline)
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    def to_dict(self):
+        with self._cond:
+            return {
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'service_time_ms': self.service_time * 1000,
+                'estimated_wait_ms': self.estimated_wait() * 1000
+            }
@@ -0,0 +1,120 @@
+import json
+import zlib
+
+READ_CHUNK_BYTES = 65536
+
+class LineTooLong(Exception):
+    """A line exceeded the per-line size limit"""
+
+def iter_gunzipped(stream):
+    """Yield decompressed data from a gzip byte stream
+
+    Every member of a multi-member file (cat a.gz b.gz) is decompressed.
+    Output per call is capped so a small compressed upload cannot inflate
+    into a huge buffer at once. Raises ValueError if the data ends mid-member.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    in_member = False
+    pending = b''
+
+    while True:
+        if not pending:
+            pending = stream.read(READ_CHUNK_BYTES)
+            if not pending:
+                break
+
+        data = decompressor.decompress(pending, READ_CHUNK_BYTES)
+        pending = decompressor.unconsumed_tail
+        in_member = True
+        if data:
+            yield data
+
+        if decompressor.eof:
+            # Start over on whatever follows the finished member
+            pending = decompressor.unused_data + pending
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            in_member = False
+
+    if in_member:
+        raise ValueError("Truncated gzip stream")
+
+def iter_raw_lines(stream, gzipped=False, max_line_bytes=1048576):
+    """Yield (line_number, bytes or LineTooLong) from a possibly gzip-compressed byte stream
+
+    Memory is bounded by the read size plus max_line_bytes however large the
+    upload is. An over-long line is reported once and skipped up to its newline.
+    """
+    buffer = b''
+    line_number = 0
+    skipping = False
+
+    def lines_from(data):
+        nonlocal buffer, line_number, skipping
+        buffer += data
+        start = 0
+        while True:
+            newline = buffer.find(b'\n', start)
+            if newline == -1:
+                break
+            line, start = buffer[start:newline], newline + 1
+            if skipping:
+                skipping = False
+                continue
+            line_number += 1
+            if len(line) > max_line_bytes:
+                yield line_number, LineTooLong(f"Line exceeds {max_line_bytes} bytes")
+            else:
+                yield line_number, line
+        buffer = buffer[start:]
+
+        if len(buffer) > max_line_bytes:
+            if not skipping:
+                line_number += 1
+                yield line_number, LineTooLong(f"Line exceeds {max_line_bytes} bytes")
+            skipping = True
+            buffer = b''
+
+    if gzipped:
+        pieces = iter_gunzipped(stream)
+    else:
+        pieces = iter(lambda: stream.read(READ_CHUNK_BYTES), b'')
+
+    for data in pieces:
+        yield from lines_from(data)
+
+    if buffer.strip() and not skipping:
+        line_number += 1
+        yield line_number, buffer
+
+def parse_email_line(raw):
+    """Parse one NDJSON line into (id, text)
+
+    A line is either a JSON object with a 'text' field (and optional 'id') or
+    a bare JSON string. Raises ValueError with a message for the client.
+    """
+    try:
+        item = json.loads(raw)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid JSON: {e}")
+
+    if isinstance(item, str):
+        item = {'text': item}
+
+    if not isinstance(item, dict) or not isinstance(item.get('text'), str):
+        raise ValueError("Each line must be a JSON object with a 'text' string")
+
+    if not item['text'].strip():
+        raise ValueError("Email text cannot be empty")
+
+    return item.get('id'), item['text']
+
+def iter_chunks(items, size):
+    """Group an iterable into lists of at most size items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,164 @@
+import re
+from email import policy
+from email.parser import Parser
+from html.parser import HTMLParser
+
+# Enough words to fill the 512-token T5 input (a word is at least one token)
+DEFAULT_MAX_WORDS = 512
+
+# How much of the raw text to inspect when sniffing for headers or HTML
+SNIFF_CHARS = 8192
+
+# HTML is fed to the parser in chunks so large documents can stop early
+HTML_CHUNK_CHARS = 65536
+
+# Visible characters per budgeted word before HTML extraction stops
+CHARS_PER_WORD = 20
+
+HEADER_LINE = re.compile(r'^(To|From|Subject|Date|CC|BCC):', re.IGNORECASE)
+RFC822_HEADER = re.compile(r'^[!-9;-~]+:')
+MESSAGE_HEADER = re.compile(r'^(From|To|Subject|Date|MIME-Version|Content-Type):', re.IGNORECASE)
+SIGNATURE_START = re.compile(r'^(--\s*$|Best regards|Sincerely|Thanks)')
+REPLY_START = re.compile(r'^(On .+ wrote:\s*$|-{2,}\s*Original Message\s*-{2,})', re.IGNORECASE)
+HTML_TAG = re.compile(r'<(html|body|div|p|br|table|span)\b', re.IGNORECASE)
+URL_OR_ADDRESS = re.compile(r'http\S+|www\.\S+|\S+@\S+')
+DISALLOWED_CHARS = re.compile(r'[^\w\s.,!?-]')
+
+class _HTMLTextExtractor(HTMLParser):
+    """Collect visible text from HTML, one line per block element"""
+
+    BLOCK_TAGS = {'p', 'div', 'br', 'tr', 'li', 'table', 'h1', 'h2', 'h3', 'h4', 'blockquote'}
+    SKIP_TAGS = {'script', 'style', 'head', 'title'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+def html_to_text(html, max_chars=None):
+    """Strip tags, scripts and styles from HTML, stopping after about max_chars of text"""
+    extractor = _HTMLTextExtractor()
+    collected = 0
+
+    for start in range(0, len(html), HTML_CHUNK_CHARS):
+        done = len(extractor.parts)
+        extractor.feed(html[start:start + HTML_CHUNK_CHARS])
+        collected += sum(len(part) for part in extractor.parts[done:])
+        if max_chars is not None and collected >= max_chars:
+            break
+
+    extractor.close()
+    return ''.join(extractor.parts)
+
+def iter_lines(text, max_chars=None):
+    """Yield lines lazily so a scan can stop without splitting the whole text
+
+    With max_chars, longer lines are cut to their first max_chars characters
+    so a huge single-line paste is never copied or scanned in full.
+    """
+    start = 0
+    while start <= len(text):
+        end = text.find('\n', start)
+        if end == -1:
+            end = len(text)
+        stop = end if max_chars is None else min(end, start + max_chars)
+        yield text[start:stop]
+        start = end + 1
+
+def looks_like_message(text):
+    """True if the text starts with an RFC 822 header block followed by a blank line"""
+    head = text[:SNIFF_CHARS].replace('\r\n', '\n')
+    header_block, separator, _ = head.partition('\n\n')
+    if not separator:
+        return False
+
+    lines = header_block.split('\n')
+    if not RFC822_HEADER.match(lines[0]):
+        return False
+
+    # Every line must be a header or a folded continuation of one, and at
+    # least one must be a real message header; otherwise a first paragraph
+    # like "Reminder: ..." would be mistaken for headers and dropped
+    return (
+        all(RFC822_HEADER.match(line) or line[:1] in (' ', '\t') for line in lines)
+        and any(MESSAGE_HEADER.match(line) for line in lines)
+    )
+
+def message_body(text, max_chars=None):
+    """Readable body of an RFC 822 message: the plain part if any, else stripped HTML
+
+    Attachments are skipped without being decoded.
+    """
+    message = Parser(policy=policy.default).parsestr(text)
+    body = message.get_body(preferencelist=('plain', 'html'))
+    if body is None:
+        return ''
+
+    try:
+        content = body.get_content()
+    except LookupError:
+        # Unknown charset (e.g. 'unknown-8bit'); decode as best we can
+        payload = body.get_payload(decode=True) or b''
+        content = payload.decode('utf-8', errors='replace')
+
+    # Untyped bodies default to text/plain but may still be HTML
+    if body.get_content_subtype() == 'html' or HTML_TAG.search(content, 0, SNIFF_CHARS):
+        content = html_to_text(content, max_chars)
+    return content
+
+def clean_email(text, max_words=DEFAULT_MAX_WORDS):
+    """Clean email text for summarization in a single pass over its lines
+
+    Real messages are parsed with the standard library email parser; pasted
+    HTML is reduced to text. Header lines and quoted reply lines are dropped,
+    and scanning stops at a signature, the start of a quoted reply or once
+    max_words words have been collected.
+    """
+    max_chars = max_words * CHARS_PER_WORD
+
+    if looks_like_message(text):
+        text = message_body(text, max_chars)
+    elif HTML_TAG.search(text, 0, SNIFF_CHARS):
+        text = html_to_text(text, max_chars)
+
+    words = []
+    first_line = True
+    # A line longer than max_chars holds more than max_words words
+    for line in iter_lines(text, max_chars):
+        line = line.strip()
+
+        # Signatures end the useful content (but not on the very first line)
+        if not first_line and SIGNATURE_START.match(line):
+            break
+        if REPLY_START.match(line):
+            break
+        first_line = False
+
+        if not line or line.startswith('>') or HEADER_LINE.match(line):
+            continue
+
+        line = URL_OR_ADDRESS.sub('', line)
+        line = DISALLOWED_CHARS.sub('', line)
+
+        words.extend(line.split())
+        if len(words) >= max_words:
+            del words[max_words:]
+            break
+
+    return ' '.join(words)
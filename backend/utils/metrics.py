@@ -0,0 +1,76 @@
+import threading
+from collections import deque
+
+class LatencyMetric:
+    """Running count and latency percentiles over a window of recent samples"""
+
+    def __init__(self, window=1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.samples.append(seconds)
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total * 1000,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(0.5) * 1000,
+            'p95_ms': self.percentile(0.95) * 1000,
+            'max_ms': self.max * 1000
+        }
+
+class Counters:
+    """Thread-safe named counters"""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def to_dict(self):
+        with self._lock:
+            return dict(self._values)
+
+class MetricsRegistry:
+    """Named latency metrics and counters exposed by the /metrics endpoint"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.counters = Counters()
+        self._lock = threading.Lock()
+
+    def latency(self, name):
+        with self._lock:
+            if name not in self.latencies:
+                self.latencies[name] = LatencyMetric()
+            return self.latencies[name]
+
+    def increment(self, name, amount=1):
+        self.counters.increment(name, amount)
+
+    def to_dict(self):
+        with self._lock:
+            latencies = dict(self.latencies)
+        return {
+            'latency': {name: metric.to_dict() for name, metric in latencies.items()},
+            'counters': self.counters.to_dict()
+        }
@@ -0,0 +1,238 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame):
+    """Root-to-leaf stack of a frame in collapsed (flamegraph) form"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+class StackProfile:
+    """Aggregated stack samples"""
+
+    def __init__(self):
+        self.stacks = Counter()
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def add(self, stack):
+        with self._lock:
+            self.stacks[stack] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """One 'frame;frame;frame count' line per distinct stack, for flamegraph.pl or speedscope"""
+        with self._lock:
+            return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, top_n=20):
+        """Functions ranked by inclusive samples, with their self (leaf) samples"""
+        inclusive = Counter()
+        leaf = Counter()
+
+        with self._lock:
+            stacks = list(self.stacks.items())
+            samples = self.samples
+
+        for stack, count in stacks:
+            frames = stack.split(';')
+            leaf[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+
+        return [{
+            'function': frame,
+            'inclusive_samples': count,
+            'inclusive_pct': count / samples * 100 if samples else 0.0,
+            'self_samples': leaf[frame],
+            'self_pct': leaf[frame] / samples * 100 if samples else 0.0
+        } for frame, count in inclusive.most_common(top_n)]
+
+    def to_dict(self, top_n=20):
+        return {
+            'samples': self.samples,
+            'top_functions': self.top_functions(top_n),
+            'collapsed': self.collapsed()
+        }
+
+class StackSampler:
+    """Background thread that samples Python stacks at a fixed interval
+
+    With thread_ids=None every thread except the sampler (and any excluded
+    ones) is sampled; otherwise only the ids in the given set, which may
+    change while sampling. With a duration the sampler stops by itself.
+    """
+
+    def __init__(self, profile, interval=0.005, thread_ids=None, exclude=(), duration=None):
+        self.profile = profile
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.exclude = set(exclude)
+        self.duration = duration
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        targets = None if self.thread_ids is None else set(self.thread_ids)
+
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id or thread_id in self.exclude:
+                continue
+            if targets is not None and thread_id not in targets:
+                continue
+            self.profile.add(collapse_stack(frame))
+
+    def _run(self):
+        ends_at = None if self.duration is None else time.monotonic() + self.duration
+        while not self._stop.wait(self.interval):
+            if ends_at is not None and time.monotonic() >= ends_at:
+                break
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+class TimedProfiler:
+    """Samples every thread of the process for a fixed time in the background"""
+
+    def __init__(self):
+        self.profile = StackProfile()
+        self.seconds = 0
+        self.started_at = None
+        self._sampler = None
+        self._lock = threading.Lock()
+
+    def start(self, seconds, interval):
+        """Start a new run; returns False if one is already in progress"""
+        with self._lock:
+            if self._sampler is not None and self._sampler.is_running():
+                return False
+
+            self.profile = StackProfile()
+            self.seconds = seconds
+            self.started_at = time.time()
+            self._sampler = StackSampler(self.profile, interval, duration=seconds)
+            self._sampler.start()
+            return True
+
+    def status(self, top_n=20):
+        with self._lock:
+            status = {
+                'running': self._sampler is not None and self._sampler.is_running(),
+                'seconds': self.seconds,
+                'started_at': self.started_at
+            }
+        return {**status, **self.profile.to_dict(top_n)}
+
+class RequestProfiler:
+    """Samples the threads handling the next K requests to one endpoint
+
+    Work a profiled request hands to another thread is followed when the
+    thread's target is wrapped with follow(). When not armed, begin() is a
+    single attribute check.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.endpoint = None
+        self.remaining = 0
+        self.requested = 0
+        self.completed = 0
+        self.profile = StackProfile()
+        self._active = set()
+        self._sampler = None
+        self._lock = threading.Lock()
+
+    def arm(self, endpoint, count):
+        """Profile the next count requests to endpoint, discarding any previous results"""
+        with self._lock:
+            self._stop_sampler()
+            self.endpoint = endpoint
+            self.remaining = count
+            self.requested = count
+            self.completed = 0
+            self.profile = StackProfile()
+            self._active = set()
+
+    def begin(self, path):
+        """Called at the start of every request; returns True if this request is profiled"""
+        if self.endpoint is None:
+            return False
+
+        with self._lock:
+            if path != self.endpoint or self.remaining <= 0:
+                return False
+
+            self.remaining -= 1
+            self._active.add(threading.get_ident())
+            if self._sampler is None:
+                self._sampler = StackSampler(self.profile, self.interval, thread_ids=self._active)
+                self._sampler.start()
+            return True
+
+    def end(self):
+        """Called when a profiled request finishes"""
+        with self._lock:
+            self._active.discard(threading.get_ident())
+            self.completed += 1
+            self._finish_if_done()
+
+    def follow(self, func):
+        """Wrap func so the thread running it is sampled if the calling request is profiled"""
+        if self.endpoint is None or threading.get_ident() not in self._active:
+            return func
+
+        active = self._active
+
+        def followed(*args, **kwargs):
+            thread_id = threading.get_ident()
+            with self._lock:
+                active.add(thread_id)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    active.discard(thread_id)
+                    # Only finish the run this work belonged to
+                    if active is self._active:
+                        self._finish_if_done()
+
+        return followed
+
+    def _finish_if_done(self):
+        if self.endpoint is not None and self.remaining <= 0 and not self._active:
+            self._stop_sampler()
+            self.endpoint = None
+
+    def _stop_sampler(self):
+        if self._sampler is not None:
+            self._sampler.stop()
+            self._sampler = None
+
+    def status(self, top_n=20):
+        with self._lock:
+            status = {
+                'endpoint': self.endpoint,
+                'requested': self.requested,
+                'completed': self.completed,
+                'done': self.endpoint is None
+            }
+        return {**status, **self.profile.to_dict(top_n)}
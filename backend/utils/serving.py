@@ -0,0 +1,64 @@
+import os
+
+def available_cpus():
+    """CPU cores this process is allowed to run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def plan_topology(workers, threads_per_worker=None, cpus=None):
+    """Split the available cores between workers
+
+    Returns (threads_per_worker, core sets), one set of cores per worker.
+    Raises ValueError if the configuration would oversubscribe the CPU.
+    """
+    cpus = available_cpus() if cpus is None else list(cpus)
+
+    if workers < 1:
+        raise ValueError("At least one worker is required")
+
+    if threads_per_worker is None:
+        threads_per_worker = max(1, len(cpus) // workers)
+
+    if threads_per_worker < 1:
+        raise ValueError("Each worker needs at least one torch thread")
+
+    if workers * threads_per_worker > len(cpus):
+        raise ValueError(
+            f"{workers} workers x {threads_per_worker} torch threads oversubscribes "
+            f"{len(cpus)} available cores"
+        )
+
+    core_sets = [
+        set(cpus[i * threads_per_worker:(i + 1) * threads_per_worker])
+        for i in range(workers)
+    ]
+    return threads_per_worker, core_sets
+
+def read_memory_kb(pid='self'):
+    """Resident and proportional set size of a process in kB (Linux only)
+
+    PSS splits shared pages between the processes mapping them, so it shows
+    how much of the model weights a forked worker actually shares.
+    """
+    memory = {'rss_kb': None, 'pss_kb': None}
+
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    memory['rss_kb'] = int(line.split()[1])
+                    break
+    except OSError:
+        return memory
+
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    memory['pss_kb'] = int(line.split()[1])
+                    break
+    except OSError:
+        pass
+
+    return memory
@@ -0,0 +1,16 @@
+"""
+WSGI entry point for multi-process serving
+Models are initialized at import time, so with gunicorn's preload_app the
+parent loads them once and forked workers share the weights copy-on-write.
+Run with: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import gc
+from app import app, initialize_models
+
+initialize_models()
+
+# Move everything loaded so far out of the tracked generations so the garbage
+# collector does not touch (and un-share) those pages in the workers
+gc.collect()
+gc.freeze()
@@ -43,7 +43,9 @@ api.interceptors.response.use(
     if (error.response) {
       // Server responded with error status
       const { status, data } = error.response;
-      throw new Error(data?.error || `Server error: ${status}`);
+      const serverError = new Error(data?.error || `Server error: ${status}`);
+      serverError.status = status;
+      throw serverError;
     } else if (error.request) {
       // Request was made but no response received
       throw new Error('Unable to connect to server. Please check if the backend is running.');
@@ -66,6 +68,12 @@ const tryRealApiOrFallback = async (realApiCall, mockApiCall, operationName) =>
     // Try real API first
     return await realApiCall();
   } catch (error) {
+    // The backend is up but overloaded or a single generation failed; report it
+    // rather than switching the whole session to mock mode
+    if (error.status === 429 || error.status === 503 || error.fallback === false) {
+      throw error;
+    }
+
     // Switch to mock mode for this session
     isMockMode = true;
     mockModeReason = error.message;
@@ -96,11 +104,12 @@ export const emailService = {
   getMockModeReason: () => mockModeReason,
 
   // Predict spam/ham with automatic fallback
-  predictSpam: async (emailText) => {
+  predictSpam: async (emailText, explain = false) => {
     return await tryRealApiOrFallback(
       async () => {
         const response = await api.post('/predict', {
-          text: emailText
+          text: emailText,
+          explain: explain
         });
         return response.data;
       },
@@ -129,15 +138,80 @@ export const emailService = {
     );
   },
 
+  // Summarize email, calling onToken with text as it is generated. Resolves with
+  // the final summary payload. Streaming has no overall timeout, so long emails
+  // are not cut off by the 30 second client limit.
+  summarizeEmailStream: async (emailText, maxLength = 50, minLength = 10, onToken = () => {}) => {
+    return await tryRealApiOrFallback(
+      async () => {
+        const response = await fetch(`${API_BASE_URL}/summarize/stream`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({
+            text: emailText,
+            max_length: maxLength,
+            min_length: minLength
+          })
+        });
+
+        if (!response.ok || !response.body) {
+          const data = await response.json().catch(() => ({}));
+          const serverError = new Error(data?.error || `Server error: ${response.status}`);
+          serverError.status = response.status;
+          throw serverError;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+
+          // Server-sent events are separated by a blank line
+          let boundary;
+          while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            const event = rawEvent.match(/^event: (.*)$/m)?.[1];
+            const data = JSON.parse(rawEvent.match(/^data: (.*)$/m)?.[1] || '{}');
+
+            if (event === 'token') onToken(data.text);
+            if (event === 'done') return data;
+            if (event === 'error') {
+              const streamError = new Error(data.error);
+              streamError.status = 500;
+              streamError.fallback = false;
+              throw streamError;
+            }
+          }
+        }
+
+        throw new Error('Summary stream ended unexpectedly');
+      },
+      async () => {
+        const result = await mockEmailService.summarizeEmail(emailText, maxLength, minLength);
+        onToken(result.summary);
+        return result;
+      },
+      'streaming email summarization'
+    );
+  },
+
   // Analyze email (both spam detection and summarization) with automatic fallback
-  analyzeEmail: async (emailText, maxLength = 50, minLength = 10, forceSummary = false) => {
+  analyzeEmail: async (emailText, maxLength = 50, minLength = 10, forceSummary = false, explain = false, mode = 'sequential') => {
     return await tryRealApiOrFallback(
       async () => {
         const response = await api.post('/analyze', {
           text: emailText,
           max_length: maxLength,
           min_length: minLength,
-          force_summary: forceSummary
+          force_summary: forceSummary,
+          explain: explain,
+          mode: mode
         });
         return response.data;
       },